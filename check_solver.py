@@ -0,0 +1,97 @@
+"""
+check_solver.py — 求解器回归检查
+核对 Soma Cube 的解数，以及纯 Python DLX、Numba u64 / u128 内核、
+多进程搜索之间的结果一致性。直接运行：python check_solver.py
+"""
+
+import contextlib
+import io
+
+import solver
+from pieces import Piece, SOMA_PIECES, SOMA_TARGET, create_box_target
+from solver import PuzzleSolver, _solve_exact_cover_nb
+
+
+# 12 块五连方（平面积木），拼 10×6 矩形共 72 列，走 u128 内核
+PENTOMINOES = [
+    Piece(name, [(x, y, 0) for x, y in cells]) for name, cells in [
+        ("F", [(1, 0), (2, 0), (0, 1), (1, 1), (1, 2)]),
+        ("I", [(0, 0), (1, 0), (2, 0), (3, 0), (4, 0)]),
+        ("L", [(0, 0), (0, 1), (0, 2), (0, 3), (1, 3)]),
+        ("N", [(1, 0), (1, 1), (0, 2), (1, 2), (0, 3)]),
+        ("P", [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)]),
+        ("T", [(0, 0), (1, 0), (2, 0), (1, 1), (1, 2)]),
+        ("U", [(0, 0), (2, 0), (0, 1), (1, 1), (2, 1)]),
+        ("V", [(0, 0), (0, 1), (0, 2), (1, 2), (2, 2)]),
+        ("W", [(0, 0), (0, 1), (1, 1), (1, 2), (2, 2)]),
+        ("X", [(1, 0), (0, 1), (1, 1), (2, 1), (1, 2)]),
+        ("Y", [(1, 0), (0, 1), (1, 1), (1, 2), (1, 3)]),
+        ("Z", [(0, 0), (1, 0), (1, 1), (1, 2), (2, 2)]),
+    ]
+]
+
+
+def run(pieces, target, use_numba, **kwargs):
+    """用指定后端求解（不打印求解过程），返回 (解列表, 求解器)"""
+    has_numba, min_rows = solver.HAS_NUMBA, solver.NB_MIN_ROWS
+    solver.HAS_NUMBA = has_numba and use_numba
+    solver.NB_MIN_ROWS = 0
+    try:
+        s = PuzzleSolver(pieces, target)
+        with contextlib.redirect_stdout(io.StringIO()):
+            solutions = s.solve(**kwargs)
+    finally:
+        solver.HAS_NUMBA, solver.NB_MIN_ROWS = has_numba, min_rows
+    return solutions, s
+
+
+def check_soma_counts():
+    """Soma Cube：全部解 15312 个；对称性剪枝后每个旋转等价类一个，共 638 个"""
+    for use_numba in (False, True):
+        full, _ = run(SOMA_PIECES, SOMA_TARGET, use_numba, find_all=True)
+        assert len(full) == 15312, len(full)
+        reduced, _ = run(SOMA_PIECES, SOMA_TARGET, use_numba, find_all=True, break_symmetry=True)
+        assert len(reduced) == 638, len(reduced)
+    print("✓ Soma 解数：15312 个，剪枝后 638 个")
+
+
+def check_backends():
+    """纯 Python DLX、u64 内核、u128 内核得到完全相同的解（含顺序）"""
+    # Soma（34 列）：同一份放置表分别交给 DLX、u64 内核和补一个全零高位字的 u128 内核
+    _, s = run(SOMA_PIECES, SOMA_TARGET, False, find_all=True)
+    cell_order = s._cell_order()
+    n_cols = len(s.bit_to_cell) + len(s.pieces)
+    expected = s._search_dlx(cell_order, True, 0, 1)
+    for n_col_words in (1, 2):
+        col_words = s._pack_columns(cell_order, n_col_words)
+        assert _solve_exact_cover_nb(col_words, n_cols, True, 0) == expected, n_col_words
+    print(f"✓ Soma：DLX 与 u64 / u128 内核一致（{len(expected)} 个解）")
+
+    # 五连方 10×6（72 列）：经 solve 走 u128 内核，与纯 Python 比较
+    target = create_box_target(10, 6, 1)
+    py, _ = run(PENTOMINOES, target, False, find_all=True, max_solutions=200)
+    nb, _ = run(PENTOMINOES, target, True, find_all=True, max_solutions=200)
+    assert py == nb
+    print(f"✓ 五连方 10×6：DLX 与 u128 内核一致（{len(py)} 个解）")
+
+
+def check_parallel():
+    """workers=2 且限制解数时，结果等于单进程搜索结果的前缀"""
+    for use_numba in (False, True):
+        serial, _ = run(SOMA_PIECES, SOMA_TARGET, use_numba, find_all=True)
+        parallel, _ = run(SOMA_PIECES, SOMA_TARGET, use_numba, find_all=True,
+                          max_solutions=1000, workers=2)
+        assert parallel == serial[:1000]
+        parallel, _ = run(SOMA_PIECES, SOMA_TARGET, use_numba, find_all=True, workers=2)
+        assert parallel == serial
+    print("✓ 多进程搜索与单进程结果（及其前缀）一致")
+
+
+if __name__ == "__main__":
+    if not solver.HAS_NUMBA:
+        print("未安装 numba，只检查纯 Python DLX")
+    check_soma_counts()
+    if solver.HAS_NUMBA:
+        check_backends()
+    check_parallel()
+    print("\n全部检查通过")
@@ -3,7 +3,48 @@ pieces.py — 积木定义与管理
 提供 Piece 类来定义三维积木，并自动生成所有旋转姿态。
 """
 
-from rotations import ALL_ROTATIONS, rotate_coords, normalize
+from functools import lru_cache
+
+import numpy as np
+
+from rotations import rotate_all, normalize
+
+
+@lru_cache(maxsize=None)
+def _unique_orientations(shape_key):
+    """
+    计算一种形状的所有唯一姿态，按形状缓存：
+    形状相同的积木（即使是不同实例）只计算一次。
+    
+    参数:
+        shape_key: normalize() 得到的归一化形状（bytes）
+    
+    返回:
+        tuple of (N,3) int64 数组
+    """
+    coords = np.frombuffer(shape_key, dtype=np.int64).reshape(-1, 3)
+    # 24 种旋转一次算完，再整体平移到各轴最小值为 0
+    rotated = rotate_all(coords)                            # (24, N, 3)
+    shifted = rotated - rotated.min(axis=1, keepdims=True)
+
+    # 24 个姿态一起按 (x, y, z) 字典序排序：坐标都在 [0, ext) 内，
+    # 线性编号的顺序即字典序
+    ext = int(shifted.max()) + 1
+    lin = (shifted[..., 0] * ext + shifted[..., 1]) * ext + shifted[..., 2]
+    canonical = np.take_along_axis(shifted, np.argsort(lin, axis=1)[..., None], axis=1)
+
+    # 去重键：排序后坐标的字节串；坐标较小时用 int8，键更短
+    key_dtype = np.int8 if ext <= 128 else np.int64
+    keys = canonical.astype(key_dtype).reshape(len(canonical), -1)
+    seen = set()
+    orientations = []
+    for ori, key_row in zip(canonical, keys):
+        key = key_row.tobytes()
+        if key not in seen:
+            seen.add(key)
+            ori.flags.writeable = False     # 缓存结果被多个实例共享，禁止原地修改
+            orientations.append(ori)
+    return tuple(orientations)
 
 
 class Piece:
@@ -26,6 +67,7 @@ class Piece:
         self.name = name
         self.coords = [tuple(c) for c in coords]
         self.color = color
+        self._shape_key = normalize(self.coords)  # 姿态缓存的键
         self._orientations = None  # 缓存
 
     def get_unique_orientations(self):
@@ -33,20 +75,12 @@ class Piece:
         计算该积木所有不重复的旋转姿态。
         
         返回:
-            list of list of (x,y,z) — 每个元素是一种唯一姿态的坐标列表
+            list of (N,3) int64 数组 — 每个元素是一种唯一姿态的坐标，按字典序排列
         """
         if self._orientations is not None:
             return self._orientations
 
-        seen = set()
-        orientations = []
-        for rot_matrix in ALL_ROTATIONS:
-            rotated = rotate_coords(self.coords, rot_matrix)
-            normalized = normalize(rotated)
-            if normalized not in seen:
-                seen.add(normalized)
-                orientations.append(list(normalized))
-        
+        orientations = list(_unique_orientations(self._shape_key))
         self._orientations = orientations
         return orientations
 
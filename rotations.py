@@ -4,31 +4,57 @@ rotations.py — 三维旋转工具
 """
 
 import numpy as np
-from itertools import product
+from itertools import permutations, product
+
+
+def _permutation_sign(perm):
+    """排列的奇偶性：偶排列返回 1，奇排列返回 -1（按逆序数计算）"""
+    inversions = sum(1 for i in range(len(perm)) for j in range(i + 1, len(perm))
+                     if perm[i] > perm[j])
+    return -1 if inversions % 2 else 1
 
 
 def _generate_all_rotation_matrices():
     """
     生成 24 种三维旋转矩阵（纯旋转，不含镜像）。
     方法：枚举所有 3x3 符号排列矩阵中行列式为 +1 的正交矩阵。
+    符号排列矩阵的行列式 = 排列奇偶性 × 各符号之积，无需数值计算。
     """
     matrices = []
     # 三个轴的排列 (0,1,2) 的全排列 × 每轴正负号 → 筛选行列式=+1
     axes = [0, 1, 2]
-    from itertools import permutations
     for perm in permutations(axes):
+        perm_sign = _permutation_sign(perm)
         for signs in product([1, -1], repeat=3):
+            if perm_sign * signs[0] * signs[1] * signs[2] != 1:
+                continue
             mat = np.zeros((3, 3), dtype=int)
             for i in range(3):
                 mat[i][perm[i]] = signs[i]
-            if np.linalg.det(mat) > 0:
-                matrices.append(mat)
+            matrices.append(mat)
     return matrices
 
 
 # 预计算的 24 种旋转矩阵
 ALL_ROTATIONS = _generate_all_rotation_matrices()
 
+# 同一组矩阵堆叠成 (24, 3, 3) 数组，便于一次性批量旋转
+ALL_ROTATIONS_ARR = np.stack(ALL_ROTATIONS).astype(np.int8)
+
+
+def rotate_all(coords):
+    """
+    一次性施加全部 24 种旋转。
+    
+    参数:
+        coords: list of (x, y, z) 元组，或 (N, 3) 数组
+    
+    返回:
+        (24, N, 3) 数组，第 r 个切片为第 r 种旋转的结果
+    """
+    arr = np.asarray(coords, dtype=int)        # shape: (N, 3)
+    return np.einsum('rij,nj->rni', ALL_ROTATIONS_ARR, arr)
+
 
 def rotate_coords(coords, matrix):
     """
@@ -46,21 +72,24 @@ def rotate_coords(coords, matrix):
     return [tuple(row) for row in rotated]
 
 
+def sort_coords(arr):
+    """按 (x, y, z) 字典序排列 (N, 3) 坐标数组的行"""
+    return arr[np.lexsort((arr[:, 2], arr[:, 1], arr[:, 0]))]
+
+
 def normalize(coords):
     """
     将坐标集合归一化：平移使得各轴最小值为 0。
     这样可以比较两组形状是否相同。
     
     参数:
-        coords: list of (x, y, z) 元组
+        coords: list of (x, y, z) 元组，或 (N, 3) 数组
     
     返回:
-        归一化并排序后的坐标元组的元组 (用于哈希和比较)
+        bytes — 归一化并排序后的 int64 坐标数组的字节串 (用于哈希和比较)
     """
-    if not coords:
-        return ()
-    arr = np.array(coords, dtype=int)
-    min_vals = arr.min(axis=0)
-    normalized = arr - min_vals
+    arr = np.asarray(coords, dtype=np.int64).reshape(-1, 3)
+    if len(arr) == 0:
+        return b''
     # 排序以获得唯一表示
-    return tuple(sorted(tuple(row) for row in normalized))
+    return sort_coords(arr - arr.min(axis=0)).tobytes()
@@ -1,189 +1,589 @@
 """
 solver.py — DLX 精确覆盖求解器
-实现 Knuth 的 Algorithm X + Dancing Links，用于求解三维积木拼图。
+实现 Knuth 的 Algorithm X（位掩码版本），用于求解三维积木拼图。
 """
 
-from rotations import normalize
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+import numpy as np
 
-# ============================================================
-# Dancing Links 数据结构
-# ============================================================
-
-class DLXNode:
-    """Dancing Links 节点"""
-    __slots__ = ['left', 'right', 'up', 'down', 'column', 'row_id']
+from rotations import rotate_all
 
-    def __init__(self, column=None, row_id=None):
-        self.left = self
-        self.right = self
-        self.up = self
-        self.down = self
-        self.column = column
-        self.row_id = row_id
+# 整数置位数：int.bit_count 需要 Python 3.10+，更早的版本退回 bin().count
+if hasattr(int, 'bit_count'):
+    _bit_count = int.bit_count
+else:
+    def _bit_count(x):
+        return bin(x).count('1')
 
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:     # 未安装 numba 时退回纯 Python 的 DLX
+    HAS_NUMBA = False
 
-class ColumnHeader(DLXNode):
-    """列头节点，附加名称和计数"""
-    __slots__ = ['size', 'name']
-
-    def __init__(self, name):
-        super().__init__()
-        self.column = self
-        self.size = 0
-        self.name = name
 
+# ============================================================
+# 位掩码 Algorithm X
+# ============================================================
 
 class DLX:
     """
-    Dancing Links 实现的 Algorithm X 求解器。
+    位掩码实现的 Algorithm X 求解器。
+    每列对应一个二进制位，每行是其覆盖列的位掩码；
+    覆盖 / 回溯只需整数的与、或运算，不再维护链表节点。
     """
 
     def __init__(self):
-        self.header = ColumnHeader("header")
-        self.columns = {}       # name -> ColumnHeader
+        self.rows_by_col = []   # 列编号 -> 包含该列的行下标列表
+        self.row_ids = []       # 行下标 -> row_id
+        self.row_masks = []     # 行下标 -> 覆盖列的位掩码
         self.solution = []
         self.solutions = []
-        self._col_list = []     # 有序列列表
-
-    def add_columns(self, col_names):
-        """添加列（宇宙集元素）"""
-        prev = self.header
-        for name in col_names:
-            col = ColumnHeader(name)
-            self.columns[name] = col
-            self._col_list.append(col)
-            # 水平插入
-            col.right = self.header
-            col.left = prev
-            prev.right = col
-            self.header.left = col
-            prev = col
-
-    def add_row(self, row_id, col_names):
+        self._tables = None     # build_tables 的结果；增删行列后失效
+
+    def add_columns(self, n_cols):
+        """添加 n_cols 列（宇宙集元素），列编号依次递增，同时也是其位编号"""
+        self.rows_by_col.extend([] for _ in range(n_cols))
+        self._tables = None
+
+    def add_row(self, row_id, cols):
         """
         添加一行（一个子集）。
         
         参数:
-            row_id:    行标识符（用于追溯解）
-            col_names: 该行覆盖的列名列表
-        """
-        first = None
-        for name in col_names:
-            col = self.columns[name]
-            node = DLXNode(column=col, row_id=row_id)
-            # 垂直插入到列底部
-            node.down = col
-            node.up = col.up
-            col.up.down = node
-            col.up = node
-            col.size += 1
-            # 水平链接同一行的节点
-            if first is None:
-                first = node
-                node.left = node
-                node.right = node
-            else:
-                node.right = first
-                node.left = first.left
-                first.left.right = node
-                first.left = node
-
-    def _cover(self, col):
-        """覆盖一列"""
-        col.right.left = col.left
-        col.left.right = col.right
-        i = col.down
-        while i is not col:
-            j = i.right
-            while j is not i:
-                j.down.up = j.up
-                j.up.down = j.down
-                j.column.size -= 1
-                j = j.right
-            i = i.down
-
-    def _uncover(self, col):
-        """取消覆盖一列"""
-        i = col.up
-        while i is not col:
-            j = i.left
-            while j is not i:
-                j.column.size += 1
-                j.down.up = j
-                j.up.down = j
-                j = j.left
-            i = i.up
-        col.right.left = col
-        col.left.right = col
-
-    def _choose_column(self):
-        """选择大小最小的列（S heuristic）"""
-        min_size = float('inf')
-        chosen = None
-        col = self.header.right
-        while col is not self.header:
-            if col.size < min_size:
-                min_size = col.size
-                chosen = col
-                if min_size <= 1:
-                    break
-            col = col.right
-        return chosen
-
-    def search(self, find_all=False):
+            row_id: 行标识符（用于追溯解）
+            cols:   该行覆盖的列编号列表
+        """
+        r = len(self.row_masks)
+        mask = 0
+        for c in cols:
+            mask |= 1 << c
+            self.rows_by_col[c].append(r)
+        self.row_ids.append(row_id)
+        self.row_masks.append(mask)
+        self._tables = None
+
+    def build_tables(self):
+        """
+        构造搜索用的行集合表并缓存：每列的行集合、每行的冲突行集合，均为行位掩码。
+        并行搜索前调用一次，子进程中的各棵子树即可共用，无需重复构造。
+        
+        返回:
+            (col_rows, conflicts)
+        """
+        if self._tables is None:
+            col_rows = [sum(1 << r for r in rows) for rows in self.rows_by_col]
+            conflicts = []
+            for mask in self.row_masks:
+                conflict = 0
+                while mask:
+                    low = mask & -mask
+                    mask ^= low
+                    conflict |= col_rows[low.bit_length() - 1]
+                conflicts.append(conflict)
+            self._tables = (col_rows, conflicts)
+        return self._tables
+
+    def _choose_column(self, uncovered, live, col_rows):
+        """
+        选择存活行最少的列（S heuristic），同时做前向检查：
+        遍历全部未覆盖列，一旦发现某列已无存活行立即返回空集合。
+        
+        参数:
+            uncovered: 未覆盖列的位掩码
+            live:      存活行的位掩码（第 r 位 = 第 r 行仍可选）
+            col_rows:  列位编号 -> 包含该列的行位掩码
+        
+        返回:
+            该列存活行的位掩码（0 表示当前状态无解）
+        """
+        best = 0
+        best_size = -1
+        m = uncovered
+        while m:
+            low = m & -m
+            m ^= low
+            rows = col_rows[low.bit_length() - 1] & live
+            if not rows:
+                return 0
+            size = _bit_count(rows)
+            if best_size < 0 or size < best_size:
+                best, best_size = rows, size
+        return best
+
+    def search(self, find_all=False, max_solutions=0, init_rows=()):
         """
         Algorithm X 搜索。
         
         参数:
-            find_all: 如果为 True，查找所有解；否则找到第一个解即停止
+            find_all:      如果为 True，查找所有解；否则找到第一个解即停止
+            max_solutions: 最多查找多少个解（0 = 无限制，仅当 find_all=True 时有效）
+            init_rows:     预先选定的行下标（并行搜索时用于固定根节点分支）
         
         返回:
             bool — 是否找到（至少一个）解
         """
-        if self.header.right is self.header:
-            # 所有列已覆盖 → 找到一个解
+        col_rows, conflicts = self.build_tables()
+
+        uncovered = (1 << len(self.rows_by_col)) - 1
+        live = (1 << len(self.row_masks)) - 1
+        for r in init_rows:
+            uncovered &= ~self.row_masks[r]
+            live &= ~conflicts[r]
+        self.solution = [self.row_ids[r] for r in init_rows]
+        if not uncovered:
+            # 没有待覆盖的列 → 预选行本身就是解
             self.solutions.append(list(self.solution))
-            return not find_all  # 如果不需要全部解，返回 True 表示停止
+        else:
+            rows = self._choose_column(uncovered, live, col_rows)
+            self._search(uncovered, live, rows, col_rows, conflicts, find_all, max_solutions)
+        return bool(self.solutions)
+
+    def _search(self, uncovered, live, rows, col_rows, conflicts, find_all, max_solutions):
+        """
+        迭代搜索（显式栈，避免递归调用开销）；rows 为根层分支列的存活行。
+        返回 True 表示应停止。
+        """
+        row_masks = self.row_masks
+        row_ids = self.row_ids
+        solution = self.solution
+        base = len(solution)                # 预选行之后才是搜索选中的行
+        # 每层一帧：[未覆盖列, 存活行, 分支列中尚未尝试的行]
+        stack = [[uncovered, live, rows]]
+        while stack:
+            depth = len(stack) - 1
+            frame = stack[depth]
+            rows = frame[2]
+            if not rows:
+                # 本层已试完 → 回溯
+                stack.pop()
+                continue
+            low = rows & -rows
+            frame[2] = rows ^ low
+            r = low.bit_length() - 1
+            del solution[base + depth:]
+            solution.append(row_ids[r])
+
+            # 选中第 r 行：其列被覆盖，与之共享任一列的行全部失效
+            next_uncovered = frame[0] & ~row_masks[r]
+            next_live = frame[1] & ~conflicts[r]
+            if not next_uncovered:
+                # 所有列已覆盖 → 找到一个解
+                self.solutions.append(list(solution))
+                if not find_all or len(self.solutions) == max_solutions:
+                    return True
+                continue
 
-        col = self._choose_column()
-        if col is None or col.size == 0:
-            return False
+            # 前向检查：某个未覆盖列已无存活行时不再深入
+            next_rows = self._choose_column(next_uncovered, next_live, col_rows)
+            if next_rows:
+                stack.append([next_uncovered, next_live, next_rows])
 
-        self._cover(col)
+        del solution[base:]
+        return False
 
-        row = col.down
-        while row is not col:
-            self.solution.append(row.row_id)
 
-            # 覆盖该行涉及的所有其他列
-            j = row.right
-            while j is not row:
-                self._cover(j.column)
-                j = j.right
+# ============================================================
+# Numba JIT 搜索内核
+# ============================================================
 
-            if self.search(find_all):
-                if not find_all:
-                    self._uncover(col)
-                    return True
+# 已覆盖列用一个 / 两个 uint64 保存：不超过 64 列走 u64 内核，不超过 128 列走 u128 内核
+NB_MAX_COLS = 128
+
+# 首次调用内核需 JIT 编译（无磁盘缓存时数秒），只在 find_all 且放置数不少于此值时使用；
+# 只找一个解或规模较小时纯 Python DLX 更快
+NB_MIN_ROWS = 1000
+
+if HAS_NUMBA:
+
+    _M1 = np.uint64(0x5555555555555555)
+    _M2 = np.uint64(0x3333333333333333)
+    _M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+    _H01 = np.uint64(0x0101010101010101)
+
+    @njit(cache=True)
+    def _popcount(x):
+        """uint64 的置位数（SWAR 写法，LLVM 会识别为 popcnt）"""
+        x = x - ((x >> np.uint64(1)) & _M1)
+        x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+        x = (x + (x >> np.uint64(4))) & _M4
+        return (x * _H01) >> np.uint64(56)
+
+    @njit(cache=True)
+    def _low_mask(n):
+        """低 n 位全为 1 的 uint64（0 <= n <= 64）"""
+        if n <= 0:
+            return np.uint64(0)
+        return ~np.uint64(0) >> np.uint64(64 - min(n, 64))
+
+    @njit(cache=True)
+    def _row_bitsets(row_lo, row_hi, n_cols):
+        """
+        构造行集合位图：col_bits[c] = 包含第 c 列的行集合，
+        conflicts[r] = 与第 r 行共享列的行集合。
+        第 c 列取自 row_lo（c < 64）或 row_hi（c >= 64）；n_cols <= 64 时不读 row_hi。
+        """
+        n_rows = row_lo.shape[0]
+        n_words = (n_rows + 63) // 64
+        one = np.uint64(1)
+        col_bits = np.zeros((n_cols, n_words), dtype=np.uint64)
+        for r in range(n_rows):
+            bit = one << np.uint64(r & 63)
+            for c in range(n_cols):
+                m = row_lo[r] if c < 64 else row_hi[r]
+                if (m >> np.uint64(c & 63)) & one:
+                    col_bits[c, r >> 6] |= bit
+        conflicts = np.zeros((n_rows, n_words), dtype=np.uint64)
+        for r in range(n_rows):
+            for c in range(n_cols):
+                m = row_lo[r] if c < 64 else row_hi[r]
+                if (m >> np.uint64(c & 63)) & one:
+                    for w in range(n_words):
+                        conflicts[r, w] |= col_bits[c, w]
+        return col_bits, conflicts
+
+    @njit(cache=True)
+    def _scan_columns(col_bits, live, uncovered, base, best, best_size):
+        """
+        在一个 64 位列字中找存活行最少的未覆盖列（S heuristic），同时做前向检查。
+        只遍历 uncovered 的置位（取最低位 + 计数尾零），不逐列测试。
+        
+        参数:
+            uncovered:       该列字中未覆盖列的位掩码
+            base:            该列字第 0 位对应的列编号
+            best, best_size: 之前列字的扫描结果（best < 0 表示尚无候选）
+        
+        返回:
+            (best, best_size)；best_size == 0 表示第 best 列已无存活行
+        """
+        n_words = live.shape[0]
+        one = np.uint64(1)
+        while uncovered:
+            low = uncovered & (~uncovered + one)
+            uncovered ^= low
+            c = base + np.int64(_popcount(low - one))
+            size = np.uint64(0)
+            for w in range(n_words):
+                size += _popcount(col_bits[c, w] & live[w])
+            if size == 0:
+                return c, size
+            if best < 0 or size < best_size:
+                best = c
+                best_size = size
+        return best, best_size
+
+    @njit(cache=True)
+    def _pop_candidate(cand):
+        """取出并清除候选行集合中编号最小的行；集合为空时返回 -1"""
+        one = np.uint64(1)
+        for w in range(cand.shape[0]):
+            x = cand[w]
+            if x:
+                low = x & (~x + one)
+                cand[w] = x ^ low
+                return w * 64 + np.int64(_popcount(low - one))
+        return -1
+
+    @njit(cache=True)
+    def _grow(solutions, n_sol):
+        """解数组已满时容量翻倍"""
+        if n_sol < solutions.shape[0]:
+            return solutions
+        grown = np.full((2 * n_sol, solutions.shape[1]), -1, dtype=np.int32)
+        grown[:n_sol] = solutions
+        return grown
+
+    @njit(cache=True)
+    def solve_exact_cover_u64(row_masks, col_bits, conflicts, n_cols, find_all, max_solutions,
+                              init_covered):
+        """
+        位掩码 Algorithm X 的 JIT 版本（迭代实现），列数不超过 64 的特化：
+        已覆盖列就是一个 uint64 标量。
+        行集合按 64 位一组打包成 uint64 数组；每层保存一份存活行快照，
+        回溯时直接丢弃，无需逐行恢复。选中一行后立即做前向检查并为下一层选列。
+        
+        参数:
+            row_masks:     uint64[R]，每行覆盖列的位掩码
+            col_bits:      每列的行集合，conflicts: 每行的冲突行集合（见 _row_bitsets）
+            n_cols:        列数（<= 64）
+            find_all:      是否查找所有解
+            max_solutions: 最多查找多少个解（0 = 无限制）
+            init_covered:  uint64，预先覆盖的列（并行搜索时用于固定根节点分支）；
+                           与之相交的行一开始即失效，返回的解中不含这些列的行
+        
+        返回:
+            int32[S, n_cols] — 每行一个解（按选择顺序的行下标），不足处填 -1
+        """
+        n_rows = row_masks.shape[0]
+        n_words = (n_rows + 63) // 64
+        one = np.uint64(1)
+        full = _low_mask(n_cols)
+
+        # 每层搜索的状态
+        live = np.empty((n_cols + 1, n_words), dtype=np.uint64)  # 存活行
+        cand = np.empty((n_cols, n_words), dtype=np.uint64)      # 分支列中尚未尝试的行
+        covered = np.zeros(n_cols + 1, dtype=np.uint64)          # 已覆盖列
+        chosen = np.empty(n_cols, dtype=np.int32)                # 选中的行
+        live[0, :] = 0
+        for r in range(n_rows):
+            if (row_masks[r] & init_covered) == 0:
+                live[0, r >> 6] |= one << np.uint64(r & 63)
+        covered[0] = init_covered
+
+        solutions = np.full((16, n_cols), -1, dtype=np.int32)
+        n_sol = 0
+        if covered[0] == full:
+            # 没有待覆盖的列 → 空解
+            return solutions[:1]
+        best, size = _scan_columns(col_bits, live[0], full & ~covered[0], 0, -1, np.uint64(0))
+        if size == 0:
+            return solutions[:0]
+        cand[0, :] = col_bits[best] & live[0]
+        depth = 0
+
+        while True:
+            # 在当前层取下一个候选行；本层已试完 → 回到上一层
+            r = _pop_candidate(cand[depth])
+            if r < 0:
+                depth -= 1
+                if depth < 0:
+                    break
+                continue
+
+            # 选中第 r 行：覆盖其列，与之共享任一列的行全部失效
+            chosen[depth] = r
+            for w in range(n_words):
+                live[depth + 1, w] = live[depth, w] & ~conflicts[r, w]
+            covered[depth + 1] = covered[depth] | row_masks[r]
+
+            if covered[depth + 1] == full:
+                # 所有列已覆盖 → 记录一个解
+                solutions = _grow(solutions, n_sol)
+                solutions[n_sol, :depth + 1] = chosen[:depth + 1]
+                n_sol += 1
+                if not find_all or n_sol == max_solutions:
+                    break
+                continue
+
+            # 前向检查：某个未覆盖列已无存活行时不再深入
+            best, size = _scan_columns(col_bits, live[depth + 1], full & ~covered[depth + 1],
+                                       0, -1, np.uint64(0))
+            if size == 0:
+                continue
+            depth += 1
+            for w in range(n_words):
+                cand[depth, w] = col_bits[best, w] & live[depth, w]
+
+        return solutions[:n_sol]
+
+    @njit(cache=True)
+    def solve_exact_cover_u128(row_lo, row_hi, col_bits, conflicts, n_cols, find_all,
+                               max_solutions, init_lo, init_hi):
+        """
+        solve_exact_cover_u64 的 128 列版本：已覆盖列拆成 (低 64 位, 高 64 位) 两个 uint64。
+        
+        参数:
+            row_lo, row_hi:   uint64[R]，每行覆盖列掩码的低 / 高 64 位
+            n_cols:           列数（<= 128）
+            init_lo, init_hi: uint64，预先覆盖的列（低 / 高 64 位）
+            其余参数与返回值同 solve_exact_cover_u64
+        """
+        n_rows = row_lo.shape[0]
+        n_words = (n_rows + 63) // 64
+        one = np.uint64(1)
+        full_lo = _low_mask(n_cols)
+        full_hi = _low_mask(n_cols - 64)
+
+        # 每层搜索的状态
+        live = np.empty((n_cols + 1, n_words), dtype=np.uint64)  # 存活行
+        cand = np.empty((n_cols, n_words), dtype=np.uint64)      # 分支列中尚未尝试的行
+        covered_lo = np.zeros(n_cols + 1, dtype=np.uint64)       # 已覆盖列（低 64 位）
+        covered_hi = np.zeros(n_cols + 1, dtype=np.uint64)       # 已覆盖列（高 64 位）
+        chosen = np.empty(n_cols, dtype=np.int32)                # 选中的行
+        live[0, :] = 0
+        for r in range(n_rows):
+            if (row_lo[r] & init_lo) == 0 and (row_hi[r] & init_hi) == 0:
+                live[0, r >> 6] |= one << np.uint64(r & 63)
+        covered_lo[0] = init_lo
+        covered_hi[0] = init_hi
+
+        solutions = np.full((16, n_cols), -1, dtype=np.int32)
+        n_sol = 0
+        if covered_lo[0] == full_lo and covered_hi[0] == full_hi:
+            # 没有待覆盖的列 → 空解
+            return solutions[:1]
+        best, size = _scan_columns(col_bits, live[0], full_lo & ~covered_lo[0],
+                                   0, -1, np.uint64(0))
+        if best < 0 or size > 0:
+            best, size = _scan_columns(col_bits, live[0], full_hi & ~covered_hi[0],
+                                       64, best, size)
+        if size == 0:
+            return solutions[:0]
+        cand[0, :] = col_bits[best] & live[0]
+        depth = 0
+
+        while True:
+            # 在当前层取下一个候选行；本层已试完 → 回到上一层
+            r = _pop_candidate(cand[depth])
+            if r < 0:
+                depth -= 1
+                if depth < 0:
+                    break
+                continue
+
+            # 选中第 r 行：覆盖其列，与之共享任一列的行全部失效
+            chosen[depth] = r
+            for w in range(n_words):
+                live[depth + 1, w] = live[depth, w] & ~conflicts[r, w]
+            covered_lo[depth + 1] = covered_lo[depth] | row_lo[r]
+            covered_hi[depth + 1] = covered_hi[depth] | row_hi[r]
+
+            if covered_lo[depth + 1] == full_lo and covered_hi[depth + 1] == full_hi:
+                # 所有列已覆盖 → 记录一个解
+                solutions = _grow(solutions, n_sol)
+                solutions[n_sol, :depth + 1] = chosen[:depth + 1]
+                n_sol += 1
+                if not find_all or n_sol == max_solutions:
+                    break
+                continue
 
-            # 回溯
-            self.solution.pop()
-            j = row.left
-            while j is not row:
-                self._uncover(j.column)
-                j = j.left
+            # 前向检查：某个未覆盖列已无存活行时不再深入
+            best, size = _scan_columns(col_bits, live[depth + 1],
+                                       full_lo & ~covered_lo[depth + 1], 0, -1, np.uint64(0))
+            if best < 0 or size > 0:
+                best, size = _scan_columns(col_bits, live[depth + 1],
+                                           full_hi & ~covered_hi[depth + 1], 64, best, size)
+            if size == 0:
+                continue
+            depth += 1
+            for w in range(n_words):
+                cand[depth, w] = col_bits[best, w] & live[depth, w]
 
-            row = row.down
+        return solutions[:n_sol]
 
-        self._uncover(col)
-        return False
+
+def _exact_cover_tables(col_words, n_cols):
+    """构造内核所需的行集合表 (col_bits, conflicts)；col_words 同 _solve_exact_cover_nb"""
+    return _row_bitsets(col_words[0], col_words[-1], n_cols)
+
+
+def _solve_exact_cover_nb(col_words, n_cols, find_all, max_solutions, root_row=-1,
+                          tables=None):
+    """
+    按列字数分派到 u64 / u128 内核，返回原始解（每个解是行号列表）。
+    
+    参数:
+        col_words: 一个或两个 uint64[R] 数组（每行覆盖列掩码的低 / 高 64 位）
+        root_row:  >= 0 时固定该行为根节点（并行搜索的子树），解中包含该行
+        tables:    预先构造的 _exact_cover_tables 结果（None = 现场构造）
+    """
+    if n_cols == 0:
+        # 没有待覆盖的列 → 唯一的空解
+        return [[]]
+    if tables is None:
+        tables = _exact_cover_tables(col_words, n_cols)
+    col_bits, conflicts = tables
+    init = [m[root_row] if root_row >= 0 else np.uint64(0) for m in col_words]
+    if len(col_words) == 1:
+        sols = solve_exact_cover_u64(col_words[0], col_bits, conflicts, n_cols, find_all,
+                                     max_solutions, init[0])
+    else:
+        sols = solve_exact_cover_u128(col_words[0], col_words[1], col_bits, conflicts, n_cols,
+                                      find_all, max_solutions, init[0], init[1])
+    prefix = [root_row] if root_row >= 0 else []
+    return [prefix + [r for r in row if r >= 0] for row in sols.tolist()]
+
+
+# ============================================================
+# 根节点拆分的并行搜索
+# ============================================================
+
+_WORKER_STATE = None    # 子进程中共享的搜索数据（由 _init_worker 设置）
+
+
+def _init_worker(state):
+    """进程池初始化：每个子进程只接收一次搜索数据"""
+    global _WORKER_STATE
+    _WORKER_STATE = state
+
+
+def _dlx_subtree(root_row, max_solutions):
+    """子进程任务：在 DLX 中固定根行后搜索所有解"""
+    dlx = _WORKER_STATE
+    dlx.solutions = []
+    dlx.search(find_all=True, max_solutions=max_solutions, init_rows=[root_row])
+    return dlx.solutions
+
+
+def _numba_subtree(root_row, max_solutions):
+    """子进程任务：用 Numba 内核在固定根行后搜索所有解"""
+    col_words, n_cols, tables = _WORKER_STATE
+    return _solve_exact_cover_nb(col_words, n_cols, True, max_solutions, root_row, tables)
+
+
+def _parallel_search(task, state, row_masks, n_cols, max_solutions, workers):
+    """
+    Embarrassingly parallel search：取行数最少的列作为根节点，
+    它的每一行是一棵独立的子树，分发到进程池分别搜索。
+    
+    参数:
+        task:          子进程任务函数，task(root_row, max_solutions) -> 解列表
+        state:         传给 _init_worker 的搜索数据
+        row_masks:     每行覆盖列的位掩码（用于选根节点列）
+        n_cols:        列数
+        max_solutions: 最多查找多少个解（0 = 无限制）
+        workers:       进程数
+    
+    返回:
+        解列表，顺序与单进程搜索一致
+    """
+    if n_cols == 0:
+        # 没有待覆盖的列 → 唯一的空解，无需启动进程池
+        return [[]]
+    sizes = [0] * n_cols
+    for mask in row_masks:
+        for c in _mask_bits(mask):
+            sizes[c] += 1
+    root_col = min(range(n_cols), key=sizes.__getitem__)
+    root_rows = [r for r, mask in enumerate(row_masks) if mask >> root_col & 1]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(state,)) as pool:
+        futures = [pool.submit(task, r, max_solutions) for r in root_rows]
+        found = 0
+        for fut in as_completed(futures):
+            found += len(fut.result())
+            if max_solutions and found >= max_solutions:
+                # 任务按提交顺序执行，取消的总是靠后的子树，已完成的仍是前缀
+                for f in futures:
+                    f.cancel()
+                break
+
+    solutions = []
+    for fut in futures:
+        if not fut.cancelled():
+            solutions.extend(fut.result())
+    if max_solutions:
+        solutions = solutions[:max_solutions]
+    return solutions
 
 
 # ============================================================
 # 拼图求解器
 # ============================================================
 
+def _mask_bits(mask):
+    """位掩码中所有置位的位编号（升序）"""
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+    return bits
+
+
 class PuzzleSolver:
     """
     三维积木拼图求解器。
@@ -200,105 +600,272 @@ class PuzzleSolver:
         self.target = set(target)
         self.solutions = []  # 解列表
 
-    def _enumerate_placements(self, piece, piece_index):
+        # 位编号 → 目标格子，放置用整数位掩码表示（Python int 不限位数）
+        self.bit_to_cell = sorted(self.target)
+        # 掩码数组的 dtype：位数超过 63 时 int64 放不下，退回 Python int（object 数组）
+        self.mask_dtype = np.int64 if len(self.bit_to_cell) <= 63 else object
+
+        # 目标格子的数组形式，以及包围盒内的占用网格
+        self.target_arr = np.array(self.bit_to_cell, dtype=np.int32).reshape(-1, 3)
+        self.box_min = self.target_arr.min(axis=0) if len(self.target_arr) else np.zeros(3, np.int32)
+        self.box_size = (self.target_arr.max(axis=0) + 1 - self.box_min
+                         if len(self.target_arr) else np.zeros(3, np.int32))
+        xs, ys, zs = (self.target_arr - self.box_min).T
+        self.occ = np.zeros(self.box_size, dtype=bool)          # 该格是否属于目标
+        self.occ[xs, ys, zs] = True
+        self.bit_grid = np.full(self.box_size, -1, dtype=np.int32)  # 该格的位编号
+        self.bit_grid[xs, ys, zs] = np.arange(len(self.target_arr), dtype=np.int32)
+
+    def _mask_to_cells(self, mask):
+        """将位掩码还原为格子坐标集合"""
+        return frozenset(self.bit_to_cell[b] for b in _mask_bits(mask))
+
+    def _enumerate_placements(self, piece):
         """
-        枚举一块积木在目标结构中的所有合法放置。
+        枚举一块积木在目标结构中的所有合法放置（不含重复）。
         
         返回:
-            list of (row_id, covered_cells)
-            row_id = (piece_index, placement_index)
-            covered_cells = frozenset of (x,y,z)
+            一维数组，每个元素是一种放置覆盖格子的位掩码
+            （第 b 位对应 self.bit_to_cell[b]，格子查位见 self.bit_grid；
+            dtype 为 self.mask_dtype）
         """
-        placements = []
+        bit_rows = []
         orientations = piece.get_unique_orientations()
         
-        placement_idx = 0
         for ori in orientations:
-            # 对每种姿态，尝试在目标中的每个位置平移
-            # 计算能放置的偏移量范围
-            for anchor in self.target:
-                # 以姿态的第一个格为基准，平移到 anchor
-                ref = ori[0]
-                dx = anchor[0] - ref[0]
-                dy = anchor[1] - ref[1]
-                dz = anchor[2] - ref[2]
-                
-                translated = frozenset(
-                    (x + dx, y + dy, z + dz) for x, y, z in ori
-                )
-                
-                # 检查是否完全在目标内
-                if translated.issubset(self.target):
-                    row_id = (piece_index, placement_idx)
-                    placements.append((row_id, translated))
-                    placement_idx += 1
-
-        # 去重（不同偏移可能产生相同放置）
-        seen = set()
-        unique_placements = []
-        for row_id, cells in placements:
-            if cells not in seen:
-                seen.add(cells)
-                unique_placements.append((row_id, cells))
+            ori_arr = np.array(ori, dtype=np.int32)                   # (k, 3)
+            # 姿态的包围盒比目标的还大，任何位置都放不下
+            ext = ori_arr.max(axis=0) + 1
+            if (ext > self.box_size).any():
+                continue
+
+            # 以姿态的第一个格（字典序最小）为基准，一次性平移到目标中的每个位置。
+            # 平移后的字典序最小格就是基准位置，因此同一姿态的不同基准位置
+            # 不会得到相同的格子集合；不同姿态的归一化形状本就不同。
+            # 放置天然不重复，无需再去重。
+            shifts = self.target_arr - ori_arr[0] - self.box_min      # (T, 3)
+            # 姿态各轴最小值为 0，平移后包围盒为 [shift, shift + ext)：
+            # 先排除越出目标包围盒的平移，再逐格查占用网格
+            in_box = ((shifts >= 0) & (shifts + ext <= self.box_size)).all(axis=1)
+            if not in_box.any():
+                continue
+            rel = ori_arr[None, :, :] + shifts[in_box][:, None, :]   # (T', k, 3)
+            xs, ys, zs = rel[..., 0], rel[..., 1], rel[..., 2]
+            valid = self.occ[xs, ys, zs].all(axis=1)
+            if not valid.any():
+                continue
+
+            bit_rows.append(self.bit_grid[xs[valid], ys[valid], zs[valid]])  # (R, k)
+
+        if not bit_rows:
+            return np.empty(0, dtype=self.mask_dtype)
+        # 所有姿态的位编号拼成 (R, k)，一次性按行打包成掩码
+        bits = np.concatenate(bit_rows).astype(self.mask_dtype)
+        return np.bitwise_or.reduce(np.ones_like(bits) << bits, axis=1)
+
+    def _target_symmetries(self):
+        """
+        计算目标结构的旋转对称（含恒等旋转）。
+        
+        返回:
+            list of list of int — 每个元素是一个格子置换 perm，
+            perm[b] = 第 b 位格子在该旋转下的像的位编号
+        """
+        if not len(self.target_arr):
+            return []
+        symmetries = []
+        for rotated in rotate_all(self.target_arr):            # (T, 3)
+            # 旋转后的包围盒与原包围盒对齐，再检查是否与目标重合
+            rel = rotated - rotated.min(axis=0)
+            if (rel >= self.box_size).any():
+                continue
+            xs, ys, zs = rel.T
+            if self.occ[xs, ys, zs].all():
+                symmetries.append(self.bit_grid[xs, ys, zs].tolist())
+        return symmetries
+
+    def _break_symmetry(self, placements):
+        """
+        对称性剪枝：挑选一块积木，只保留它在目标旋转对称下每个等价类中
+        掩码最小的放置。任何解都可经某个对称旋转变为满足该约束的解，
+        因此不会丢失任何等价类。
+        被固定的积木优先选所有放置都不被任何非平凡对称保持的积木
+        （稳定子平凡），此时每个旋转等价类恰好保留一个解；
+        这样的积木有多块时取放置最多的，剪得最多。
+        
+        参数:
+            placements: list，第 i 项为积木 i 的放置掩码数组（原地修改）
+        """
+        symmetries = self._target_symmetries()
+        if len(symmetries) <= 1 or not placements:
+            return
+
+        # images[i][k] = 积木 i 的第 k 个放置在各对称旋转下的像
+        images = []
+        free = []
+        for masks in placements:
+            piece_images = []
+            for mask in masks.tolist():
+                bits = _mask_bits(mask)
+                piece_images.append([sum(1 << perm[b] for b in bits) for perm in symmetries])
+            images.append(piece_images)
+            free.append(all(len(set(im)) == len(symmetries) for im in piece_images))
+
+        if any(free):
+            pinned = max((i for i in range(len(placements)) if free[i]),
+                         key=lambda i: len(placements[i]))
+        else:
+            # 没有稳定子平凡的积木：仍然正确，但同一等价类可能保留多个解
+            pinned = min(range(len(self.pieces)),
+                         key=lambda i: len(self.pieces[i].get_unique_orientations()))
+        masks = placements[pinned]
+        keep = [mask == min(im) for mask, im in zip(masks.tolist(), images[pinned])]
+        kept = masks[np.array(keep, dtype=bool)]
+
+        print(f"  对称性剪枝：目标有 {len(symmetries)} 种旋转对称，"
+              f"积木 '{self.pieces[pinned].name}' 放置 {len(placements[pinned])} → {len(kept)}")
+        placements[pinned] = kept
+
+    def _cell_order(self):
+        """
+        格子列的排列顺序：按被覆盖的放置数升序。
+        角落等候选少的格子排在前面，搜索时同等大小的列优先选它们。
         
-        return unique_placements
+        返回:
+            list of int — 按顺序排列的格子位编号
+        """
+        cell_masks = self.placement_cell_mask
+        cell_freq = [int(((cell_masks >> b) & 1).sum()) for b in range(len(self.bit_to_cell))]
+        return sorted(range(len(cell_freq)), key=cell_freq.__getitem__)
+
+    def _search_dlx(self, cell_order, find_all, max_solutions, workers):
+        """用纯 Python DLX 求解，返回原始解（每个解是行号列表）"""
+        # 列编号：格子按 cell_order 依次为 0..T-1，积木为 T..T+P-1
+        n_cells = len(self.bit_to_cell)
+        col_of_bit = [0] * n_cells
+        for pos, b in enumerate(cell_order):
+            col_of_bit[b] = pos
 
-    def solve(self, find_all=False, max_solutions=0):
+        dlx = DLX()
+        dlx.add_columns(n_cells + len(self.pieces))
+        for r, (i, mask) in enumerate(zip(self.placement_piece_idx.tolist(),
+                                          self.placement_cell_mask.tolist())):
+            # 该行覆盖的列：格子（由掩码位还原）+ 积木
+            covered_cols = [col_of_bit[b] for b in _mask_bits(mask)]
+            covered_cols.append(n_cells + i)
+            dlx.add_row(r, covered_cols)
+
+        if find_all and workers > 1:
+            dlx.build_tables()      # 随 dlx 一起传给子进程，各子树共用
+            return _parallel_search(_dlx_subtree, dlx, dlx.row_masks, len(dlx.rows_by_col),
+                                    max_solutions, workers)
+        dlx.search(find_all=find_all, max_solutions=max_solutions)
+        return dlx.solutions
+
+    def _pack_columns(self, cell_order, n_col_words=None):
+        """
+        把放置表打包成 Numba 内核的列掩码：返回 n_col_words 个 uint64[R] 数组
+        （每行覆盖列掩码的第 k 个 64 位字）。
+        列布局与 _search_dlx 一致：格子列按 cell_order 在低位，积木列随后。
+        n_col_words 默认取容纳全部列所需的最少字数。
+        """
+        n_rows = len(self.placement_piece_idx)
+        n_cells = len(self.bit_to_cell)
+        n_cols = n_cells + len(self.pieces)
+        if n_col_words is None:
+            n_col_words = (n_cols + 63) // 64
+
+        # 先展开成 0/1 矩阵，再按 64 列一组打包成 uint64
+        cell_masks = self.placement_cell_mask
+        col_matrix = np.zeros((n_rows, 64 * n_col_words), dtype=np.uint8)
+        for pos, b in enumerate(cell_order):
+            col_matrix[:, pos] = (cell_masks >> b) & 1
+        col_matrix[np.arange(n_rows), n_cells + self.placement_piece_idx] = 1
+        packed = np.packbits(col_matrix, axis=1, bitorder='little').view('<u8')
+        return tuple(np.ascontiguousarray(packed[:, k], dtype=np.uint64)
+                     for k in range(n_col_words))
+
+    def _search_numba(self, cell_order, find_all, max_solutions, workers):
+        """用 Numba 内核求解（列数 <= 64 走 u64 特化，<= 128 走 u128），返回原始解"""
+        n_cols = len(self.bit_to_cell) + len(self.pieces)
+        col_words = self._pack_columns(cell_order)
+
+        if find_all and workers > 1:
+            row_masks = [sum(int(m) << (64 * k) for k, m in enumerate(words))
+                         for words in zip(*(w.tolist() for w in col_words))]
+            # 行集合表只构造一次，随搜索数据传给子进程，各子树共用
+            tables = _exact_cover_tables(col_words, n_cols) if n_cols else None
+            return _parallel_search(_numba_subtree, (col_words, n_cols, tables), row_masks,
+                                    n_cols, max_solutions, workers)
+        return _solve_exact_cover_nb(col_words, n_cols, find_all, max_solutions)
+
+    def solve(self, find_all=False, max_solutions=0, break_symmetry=None, workers=1):
         """
         求解拼图。
         
         参数:
             find_all:       是否查找所有解
             max_solutions:  最多查找多少个解（0 = 无限制，仅当 find_all=True 时有效）
+            break_symmetry: 是否做对称性剪枝；为 True 时，目标结构旋转对称下
+                            每个等价类只保留一个解（没有可固定的积木时可能
+                            保留多个，见 _break_symmetry），
+                            例如 Soma 的 find_all 从 15312 个解变为 638 个。
+                            None（默认）= 仅在 find_all=False 时开启，
+                            find_all=True 仍返回全部解
+            workers:        find_all 时并行搜索的进程数（1 = 单进程，0 = CPU 核数）
         
         返回:
             list of solutions，每个 solution 是 dict: {piece_index: frozenset_of_cells}
         """
-        # 1. 列名 = 每个积木的标识 + 目标中的每个格子
-        piece_col_names = [f"P{i}" for i in range(len(self.pieces))]
-        cell_col_names = [f"C{x},{y},{z}" for x, y, z in sorted(self.target)]
-        all_col_names = piece_col_names + cell_col_names
-
-        # 2. 构建 DLX 矩阵
-        dlx = DLX()
-        dlx.add_columns(all_col_names)
-
-        # 3. 枚举所有积木的所有合法放置，添加为行
-        all_placements = []  # (row_id, piece_index, cells)
-        
+        # 1. 枚举所有积木的所有合法放置
         print("正在生成所有合法放置...")
+        placements = []
         for i, piece in enumerate(self.pieces):
-            pls = self._enumerate_placements(piece, i)
+            pls = self._enumerate_placements(piece)
             print(f"  积木 '{piece.name}': {len(pls)} 种合法放置")
-            for row_id, cells in pls:
-                global_row_id = len(all_placements)
-                all_placements.append((global_row_id, i, cells))
-                
-                # 该行覆盖的列：积木标识 + 格子
-                covered_cols = [f"P{i}"]
-                covered_cols.extend(f"C{x},{y},{z}" for x, y, z in cells)
-                dlx.add_row(global_row_id, covered_cols)
-
-        total_placements = len(all_placements)
-        print(f"总计 {total_placements} 种放置，开始求解...\n")
-
-        # 4. 求解
-        if find_all:
-            dlx.search(find_all=True)
-            raw_solutions = dlx.solutions
-            if max_solutions > 0:
-                raw_solutions = raw_solutions[:max_solutions]
+            placements.append(pls)
+
+        # 2. 对称性剪枝
+        if break_symmetry is None:
+            break_symmetry = not find_all
+        if break_symmetry:
+            self._break_symmetry(placements)
+
+        # 放置表按列存放（SoA）：第 r 个放置的积木编号、格子掩码
+        n_rows = sum(len(pls) for pls in placements)
+        self.placement_piece_idx = np.empty(n_rows, dtype=np.int32)
+        self.placement_cell_mask = np.empty(n_rows, dtype=self.mask_dtype)
+        r = 0
+        for i, pls in enumerate(placements):
+            self.placement_piece_idx[r:r + len(pls)] = i
+            self.placement_cell_mask[r:r + len(pls)] = pls
+            r += len(pls)
+
+        print(f"总计 {n_rows} 种放置，开始求解...\n")
+
+        # 3. 求解：find_all 且规模足够大（列数不超过 128）时走 Numba 特化内核，
+        #    否则用纯 Python DLX
+        cell_order = self._cell_order()
+        n_cols = len(self.pieces) + len(self.bit_to_cell)
+        if workers == 0:
+            workers = os.cpu_count() or 1
+        if HAS_NUMBA and find_all and n_rows >= NB_MIN_ROWS and n_cols <= NB_MAX_COLS:
+            raw_solutions = self._search_numba(cell_order, find_all, max_solutions, workers)
         else:
-            dlx.search(find_all=False)
-            raw_solutions = dlx.solutions
+            raw_solutions = self._search_dlx(cell_order, find_all, max_solutions, workers)
 
-        # 5. 解析结果
+        # 4. 解析结果：只为解中出现的放置还原格子集合，且每个放置只还原一次
+        piece_idx = self.placement_piece_idx.tolist()
+        cell_masks = self.placement_cell_mask.tolist()
+        cells_of_row = {}
         self.solutions = []
         for raw_sol in raw_solutions:
             solution = {}
-            for global_row_id in raw_sol:
-                _, piece_idx, cells = all_placements[global_row_id]
-                solution[piece_idx] = cells
+            for r in raw_sol:
+                cells = cells_of_row.get(r)
+                if cells is None:
+                    cells = cells_of_row[r] = self._mask_to_cells(cell_masks[r])
+                solution[piece_idx[r]] = cells
             self.solutions.append(solution)
 
         return self.solutions